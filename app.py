@@ -1,12 +1,18 @@
+import math
 import os
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 from models import db, MenuItem, Order, OrderItem, Booking, Payment
+from compression import cached_json_response, init_compression
+from outlets import ensure_default_outlet, resolve_outlet
+import profiling
+from expiry import EXPIRED_STATUS, has_successful_payment, init_expiry
 import razorpay
 from datetime import datetime, timedelta
 from flask_migrate import Migrate
 from sqlalchemy import func
+from search import get_menu_index, trigram_search
 
 # Load environment variables
 load_dotenv()
@@ -14,11 +20,21 @@ load_dotenv()
 # Initialize Flask App
 app = Flask(__name__)
 CORS(app)
+profiling.init_profiling(app)
+init_compression(app)
 
 # Configure Database
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+# One pool is shared by every outlet served from this process, so connection
+# usage grows with workers rather than with the number of outlets.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+    'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'pool_pre_ping': True
+}
 
 # Initialize Database
 db.init_app(app)
@@ -27,25 +43,52 @@ migrate = Migrate(app, db)
 with app.app_context():
     print("Creating DB Tables if they don't exist...")
     db.create_all()
+    ensure_default_outlet()
     print("Tables should be created now.")
 
+app.before_request(resolve_outlet)
+
 # Initialize Razorpay
 razorpay_client = razorpay.Client(
     auth=(os.getenv('RAZORPAY_KEY_ID'), os.getenv('RAZORPAY_KEY_SECRET'))
 )
+init_expiry(app, razorpay_client)
 
 # --- CUSTOMER API ENDPOINTS ---
 
 @app.route('/api/menu', methods=['GET'])
 def get_menu():
     """Returns the available menu for customers, grouped by category."""
-    menu_items = MenuItem.query.filter_by(is_available=True).all()
-    menu_by_category = {}
-    for item in menu_items:
-        if item.category not in menu_by_category:
-            menu_by_category[item.category] = []
-        menu_by_category[item.category].append(item.to_dict())
-    return jsonify(menu_by_category)
+    index = get_menu_index(g.outlet_id)
+    return cached_json_response(('menu', g.outlet_id, index.generation), index.by_category)
+
+@app.route('/api/menu/search', methods=['GET'])
+def search_menu():
+    """Searches the available menu by text, diet, category and price range."""
+    query = request.args.get('q', '')
+    filters = {
+        'veg_only': request.args.get('veg', 'false').lower() in ('1', 'true', 'yes'),
+        'category': request.args.get('category')
+    }
+    for name in ('min_price', 'max_price'):
+        value = request.args.get(name)
+        try:
+            filters[name] = float(value) if value is not None else None
+        except ValueError:
+            return jsonify({'error': f'Invalid {name}'}), 400
+        if filters[name] is not None and not math.isfinite(filters[name]):
+            return jsonify({'error': f'Invalid {name}'}), 400
+    try:
+        filters['limit'] = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    if filters['limit'] <= 0:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    results = get_menu_index(g.outlet_id).search(query, **filters)
+    if not results and query.strip():
+        results = trigram_search(g.outlet_id, query, **filters) or []
+    return jsonify({'query': query, 'count': len(results), 'results': results})
 
 @app.route('/api/orders', methods=['POST'])
 def place_order():
@@ -55,6 +98,7 @@ def place_order():
         return jsonify({'error': 'Missing required fields'}), 400
     
     new_order = Order(
+        outlet_id=g.outlet_id,
         customer_name=data['customer_name'],
         customer_phone=data['customer_phone'],
         customer_email=data.get('customer_email'),
@@ -62,7 +106,7 @@ def place_order():
         total_price=data['total_price']
     )
     for item_data in data['items']:
-        menu_item = MenuItem.query.filter_by(name=item_data['name']).first()
+        menu_item = MenuItem.query.filter_by(outlet_id=g.outlet_id, name=item_data['name']).first()
         if menu_item:
             order_item = OrderItem(menu_item_id=menu_item.id, quantity=item_data['quantity'], price=menu_item.price)
             new_order.order_items.append(order_item)
@@ -78,6 +122,7 @@ def create_booking():
         return jsonify({'error': 'Missing required fields'}), 400
 
     new_booking = Booking(
+        outlet_id=g.outlet_id,
         customer_name=data['customer_name'],
         customer_phone=data['customer_phone'],
         booking_date=datetime.strptime(data['booking_date'], '%Y-%m-%d').date(),
@@ -95,6 +140,13 @@ def create_razorpay_order():
     if not data or 'amount' not in data:
         return jsonify({'error': 'Amount is required'}), 400
 
+    # Linking the Razorpay order lets abandoned checkouts be expired later.
+    order = None
+    if data.get('order_id') is not None:
+        order = Order.query.filter_by(id=data['order_id'], outlet_id=g.outlet_id).first()
+        if not order:
+            return jsonify({'error': 'Order not found'}), 404
+
     amount_in_paise = int(data['amount'] * 100)
     order_data = {
         'amount': amount_in_paise,
@@ -104,6 +156,9 @@ def create_razorpay_order():
     }
     try:
         razorpay_order = razorpay_client.order.create(order_data)
+        if order:
+            order.razorpay_order_id = razorpay_order['id']
+            db.session.commit()
         return jsonify({
             'razorpay_order_id': razorpay_order['id'],
             'razorpay_key_id': os.getenv('RAZORPAY_KEY_ID')
@@ -126,21 +181,33 @@ def verify_payment():
         }
         razorpay_client.utility.verify_payment_signature(params_dict)
 
-        order = Order.query.get(data['order_id'])
-        if order:
-            order.status = 'Confirmed'
+        # Locked so a retried verify or the expiry job cannot record the payment twice.
+        order = Order.query.filter_by(id=data['order_id'], outlet_id=g.outlet_id).with_for_update().first()
+        if not order:
+            return jsonify({'error': 'Order not found'}), 404
+        # A valid signature only proves payment of its own Razorpay order, never of another order.
+        if order.razorpay_order_id and order.razorpay_order_id != data['razorpay_order_id']:
+            db.session.rollback()
+            return jsonify({'error': 'Payment does not belong to this order'}), 400
+        if not order.razorpay_order_id and Payment.query.filter(
+            Payment.razorpay_order_id == data['razorpay_order_id'], Payment.order_id != order.id,
+            Payment.status == 'Success'
+        ).first():
+            db.session.rollback()
+            return jsonify({'error': 'Payment does not belong to this order'}), 400
+
+        order.status = 'Confirmed'
+        if not has_successful_payment(order.id, order.razorpay_order_id):
             payment = Payment(
-                order_id=order.id, payment_method='Razorpay',
+                outlet_id=order.outlet_id, order_id=order.id, payment_method='Razorpay',
                 razorpay_payment_id=data['razorpay_payment_id'],
                 razorpay_order_id=data['razorpay_order_id'],
                 razorpay_signature=data['razorpay_signature'],
                 amount=order.total_price, status='Success'
             )
             db.session.add(payment)
-            db.session.commit()
-            return jsonify({'message': 'Payment successful and order confirmed'})
-        else:
-            return jsonify({'error': 'Order not found'}), 404
+        db.session.commit()
+        return jsonify({'message': 'Payment successful and order confirmed'})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -149,7 +216,7 @@ def verify_payment():
 @app.route('/api/admin/menu', methods=['GET'])
 def get_admin_menu():
     """Returns the entire menu for the admin panel."""
-    menu_items = MenuItem.query.order_by(MenuItem.category, MenuItem.name).all()
+    menu_items = MenuItem.query.filter_by(outlet_id=g.outlet_id).order_by(MenuItem.category, MenuItem.name).all()
     return jsonify([item.to_dict() for item in menu_items])
 
 @app.route('/api/admin/menu', methods=['POST'])
@@ -160,7 +227,7 @@ def add_menu_item():
         return jsonify({'error': 'Missing required fields: name, price, category'}), 400
     
     new_item = MenuItem(
-        name=data['name'], description=data.get('description', ''), price=float(data['price']),
+        outlet_id=g.outlet_id, name=data['name'], description=data.get('description', ''), price=float(data['price']),
         image_url=data.get('image_url', ''), category=data['category'], is_veg=data.get('is_veg', True),
         is_available=data.get('is_available', True)
     )
@@ -171,7 +238,7 @@ def add_menu_item():
 @app.route('/api/admin/menu/<int:item_id>', methods=['PUT'])
 def update_menu_item(item_id):
     """Updates an existing menu item."""
-    item = MenuItem.query.get_or_404(item_id)
+    item = MenuItem.query.filter_by(id=item_id, outlet_id=g.outlet_id).first_or_404()
     data = request.get_json()
     item.name = data.get('name', item.name)
     item.description = data.get('description', item.description)
@@ -186,21 +253,24 @@ def update_menu_item(item_id):
 @app.route('/api/admin/menu/<int:item_id>', methods=['DELETE'])
 def delete_menu_item(item_id):
     """Deletes a menu item."""
-    item = MenuItem.query.get_or_404(item_id)
+    item = MenuItem.query.filter_by(id=item_id, outlet_id=g.outlet_id).first_or_404()
     db.session.delete(item)
     db.session.commit()
     return jsonify({'message': 'Menu item deleted successfully'}), 200
 
 @app.route('/api/admin/orders', methods=['GET'])
 def get_all_orders():
-    """Returns all orders for the admin panel."""
-    orders = Order.query.order_by(Order.order_date.desc()).all()
+    """Returns all orders for the admin panel, leaving out expired ones unless asked."""
+    orders = Order.query.filter_by(outlet_id=g.outlet_id)
+    if request.args.get('include_expired', 'false').lower() not in ('1', 'true', 'yes'):
+        orders = orders.filter(Order.status != EXPIRED_STATUS)
+    orders = orders.order_by(Order.order_date.desc()).all()
     return jsonify([order.to_dict() for order in orders])
 
 @app.route('/api/admin/orders/<int:order_id>/status', methods=['PUT'])
 def update_order_status(order_id):
     """Updates the status of an order."""
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.filter_by(id=order_id, outlet_id=g.outlet_id).first_or_404()
     data = request.get_json()
     if 'status' not in data:
         return jsonify({'error': 'Status is required'}), 400
@@ -211,7 +281,7 @@ def update_order_status(order_id):
 @app.route('/api/admin/bookings', methods=['GET'])
 def get_all_bookings():
     """Returns all bookings for the admin panel."""
-    bookings = Booking.query.order_by(Booking.booking_date.desc(), Booking.booking_time.desc()).all()
+    bookings = Booking.query.filter_by(outlet_id=g.outlet_id).order_by(Booking.booking_date.desc(), Booking.booking_time.desc()).all()
     return jsonify([booking.to_dict() for booking in bookings])
 
 @app.route('/api/admin/reports', methods=['GET'])
@@ -233,7 +303,10 @@ def get_reports():
     else:
         return jsonify({'error': 'Invalid period specified'}), 400
 
-    orders = Order.query.filter(Order.order_date >= start_date, Order.order_date <= end_date).all()
+    orders = Order.query.filter(
+        Order.outlet_id == g.outlet_id, Order.status != EXPIRED_STATUS,
+        Order.order_date >= start_date, Order.order_date <= end_date
+    ).all()
     
     total_orders = len(orders)
     total_revenue = sum(order.total_price for order in orders)
@@ -243,6 +316,7 @@ def get_reports():
     top_items_query = db.session.query(
         MenuItem.name, func.sum(OrderItem.quantity).label('total_quantity')
     ).join(OrderItem.menu_item).join(Order).filter(
+        Order.outlet_id == g.outlet_id, Order.status != EXPIRED_STATUS,
         Order.order_date >= start_date, Order.order_date <= end_date
     ).group_by(MenuItem.name).order_by(func.sum(OrderItem.quantity).desc()).limit(5).all()
     top_selling_items = [{'name': name, 'quantity': qty} for name, qty in top_items_query]
@@ -264,5 +338,29 @@ def get_reports():
         'peak_times': peak_times
     })
 
+@app.route('/api/admin/profiles', methods=['GET'])
+def get_profiles():
+    """Lists the request profiles captured by this worker, newest first."""
+    if not profiling.is_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify([profiling.summarize(p) for p in reversed(profiling.profiles)])
+
+@app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Returns a captured profile with its SQL statements and cProfile output."""
+    if not profiling.is_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(profile)
+
+@app.route('/api/admin/slow_queries', methods=['GET'])
+def get_slow_queries():
+    """Returns the most recent queries slower than SLOW_QUERY_MS in this worker."""
+    if not profiling.is_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(list(reversed(profiling.slow_queries)))
+
 if __name__ == '__main__':
     app.run(debug=True)
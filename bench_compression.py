@@ -0,0 +1,85 @@
+"""Benchmarks bytes-on-wire and CPU per request for the menu payload.
+
+Compares sending the menu uncompressed, compressing it on every request and
+serving the stored compressed bytes, using a synthetic menu so no database is
+needed:
+
+    python bench_compression.py --items 300 --requests 2000
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from compression import cached_json_response, init_compression, response_cache
+
+CATEGORIES = ['Main Course', 'Appetizers', 'Bread', 'Rice', 'Desserts', 'Beverages']
+
+
+def make_menu(n_items):
+    menu_by_category = {}
+    for i in range(n_items):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        menu_by_category.setdefault(category, []).append({
+            'id': i + 1,
+            'outlet_id': 1,
+            'name': f'Dish number {i}',
+            'description': 'Slow-cooked with aromatic whole spices, finished with cream and fresh coriander.',
+            'price': 50.0 + i % 300,
+            'image_url': f'https://i.ibb.co/68vM2bB/{1000027100 + i}.jpg',
+            'category': category,
+            'is_veg': i % 3 != 0,
+            'is_available': True
+        })
+    return menu_by_category
+
+
+def make_app(menu):
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route('/dynamic')
+    def dynamic():
+        return menu
+
+    @app.route('/cached')
+    def cached():
+        return cached_json_response(('menu', 1, 1), lambda: menu)
+
+    return app
+
+
+def run(client, path, accept_encoding, n_requests):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    size = len(client.get(path, headers=headers).data)
+    start = time.process_time()
+    for _ in range(n_requests):
+        client.get(path, headers=headers)
+    cpu = time.process_time() - start
+    return size, cpu / n_requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    client = make_app(make_menu(args.items)).test_client()
+    cases = [
+        ('identity', '/dynamic', None),
+        ('gzip per request', '/dynamic', 'gzip'),
+        ('br per request', '/dynamic', 'br'),
+        ('gzip cached', '/cached', 'gzip'),
+        ('br cached', '/cached', 'br'),
+    ]
+    print(f'{args.items} menu items, {args.requests} requests per case')
+    print(f'{"mode":<18}{"bytes":>10}{"cpu us/req":>12}')
+    for label, path, accept_encoding in cases:
+        response_cache.clear()
+        size, cpu_us = run(client, path, accept_encoding, args.requests)
+        print(f'{label:<18}{size:>10}{cpu_us:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
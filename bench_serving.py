@@ -0,0 +1,147 @@
+"""Benchmarks the gunicorn serving modes under a mix of fast and I/O-bound requests.
+
+For each mode, gunicorn is started with gunicorn.conf.py and sent a mix of
+requests. Fast requests serve the cached menu. Slow requests wait --io-ms.
+By default they sleep, as if on a Razorpay call, and no database is needed:
+
+    python bench_serving.py --modes sync gevent --concurrency 200 --requests 2000
+
+With --db, gunicorn serves the real app instead, with its DB_POOL_* engine
+options. Fast requests hit GET /api/menu and slow requests run pg_sleep on
+the database through db.session, so psycogreen and the connection pool are
+part of the measurement. Needs DATABASE_URL pointing at PostgreSQL:
+
+    DATABASE_URL=postgresql://... python bench_serving.py --db --modes gthread gevent
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from bench_compression import make_menu
+from compression import cached_json_response, init_compression
+
+IO_MS = float(os.getenv('BENCH_IO_MS', 100))
+
+bench_app = Flask(__name__)
+init_compression(bench_app)
+_menu = make_menu(100)
+
+
+@bench_app.route('/menu')
+def menu():
+    return cached_json_response(('menu', 1, 1), lambda: _menu)
+
+
+@bench_app.route('/io')
+def io():
+    time.sleep(IO_MS / 1000)
+    return {'status': 'ok'}
+
+
+def create_db_app():
+    """The real app, plus an endpoint that holds a pooled connection while PostgreSQL sleeps."""
+    from sqlalchemy import text
+
+    from app import app
+    from models import db
+
+    @app.route('/bench/db_wait')
+    def bench_db_wait():
+        db.session.execute(text('SELECT pg_sleep(:seconds)'), {'seconds': IO_MS / 1000})
+        return {'status': 'ok'}
+
+    return app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(server, port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {server.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not start on port {port}')
+
+
+def _request(url):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+        ok = True
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def bench_mode(mode, args):
+    port = _free_port()
+    env = dict(os.environ, SERVING_MODE=mode, WEB_CONCURRENCY=str(args.workers), BENCH_IO_MS=str(args.io_ms))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'bench_serving:create_db_app()' if args.db else 'bench_serving:bench_app'],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        _wait_for(server, port)
+        rng = random.Random(0)
+        slow, fast = ('bench/db_wait', 'api/menu') if args.db else ('io', 'menu')
+        urls = [f'http://127.0.0.1:{port}/' + (slow if rng.random() < args.io_share else fast)
+                for _ in range(args.requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(_request, urls))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for latency, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    return len(results) / elapsed, percentile(0.5), percentile(0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--io-share', type=float, default=0.5, help='Share of requests that wait on I/O.')
+    parser.add_argument('--io-ms', type=float, default=IO_MS)
+    parser.add_argument('--db', action='store_true', help='Serve the real app and wait on PostgreSQL.')
+    args = parser.parse_args()
+    if args.db and not os.getenv('DATABASE_URL', '').startswith('postgresql'):
+        parser.error('--db needs DATABASE_URL pointing at PostgreSQL')
+
+    print(f'{args.workers} workers, {args.concurrency} concurrent clients, {args.requests} requests, '
+          f'{args.io_share:.0%} waiting {args.io_ms:.0f} ms on {"the database" if args.db else "I/O"}')
+    print(f'{"mode":<10}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for mode in args.modes:
+        rps, p50, p99, errors = bench_mode(mode, args)
+        print(f'{mode:<10}{rps:>10.1f}{p50:>10.1f}{p99:>10.1f}{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
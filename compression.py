@@ -0,0 +1,134 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 256))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+# Responses compressed per request use cheap settings; cached ones are
+# compressed once per content version, so they can afford the best ratio.
+_LEVELS = {
+    'br': {'dynamic': 4, 'cached': 11},
+    'gzip': {'dynamic': 6, 'cached': 9},
+}
+
+
+def _compress(data, encoding, mode):
+    level = _LEVELS[encoding][mode]
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def negotiate_encoding(accept_encoding):
+    """Picks 'br', 'gzip' or None from an Accept-Encoding header value."""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for encoding in supported:
+        q = offered.get(encoding, offered.get('*', 0.0))
+        if q > 0 and (best is None or q > offered.get(best, offered.get('*', 0.0))):
+            best = encoding
+    return best
+
+
+class _CompressedCache:
+    """Bounded LRU of response bodies keyed by (content key, encoding)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = _CompressedCache(COMPRESS_CACHE_SIZE)
+
+
+def cached_json_response(key, build):
+    """Returns a JSON response whose body is serialized and compressed once per key.
+
+    key must change whenever the content does (e.g. include a version).
+    build is only called on a cache miss and returns the object to serialize.
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body = response_cache.get((key, None))
+    if body is None:
+        body = current_app.json.dumps(build()).encode('utf-8')
+        response_cache.put((key, None), body)
+    if encoding and len(body) >= COMPRESS_MIN_SIZE:
+        compressed = response_cache.get((key, encoding))
+        if compressed is None:
+            compressed = _compress(body, encoding, 'cached')
+            response_cache.put((key, encoding), compressed)
+        body = compressed
+    else:
+        encoding = None
+
+    response = current_app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """after_request hook compressing large uncompressed responses on the fly."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(_compress(body, encoding, 'dynamic'))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import or_, text
+
+from models import db, Order, Payment
+
+PENDING_STATUS = 'Pending Confirmation'
+EXPIRED_STATUS = 'Expired'
+
+ORDER_EXPIRY_MINUTES = int(os.getenv('ORDER_EXPIRY_MINUTES', 30))
+ORDER_EXPIRY_BATCH = int(os.getenv('ORDER_EXPIRY_BATCH', 200))
+ORDER_EXPIRY_RECONCILE = os.getenv('ORDER_EXPIRY_RECONCILE', 'false').lower() in ('1', 'true', 'yes')
+# Seconds between in-process runs; 0 leaves expiry to cron and `flask expire-orders`.
+ORDER_EXPIRY_INTERVAL = int(os.getenv('ORDER_EXPIRY_INTERVAL', 0))
+# PostgreSQL advisory lock key held for the duration of a run.
+ORDER_EXPIRY_LOCK_KEY = int(os.getenv('ORDER_EXPIRY_LOCK_KEY', 48151623))
+
+logger = logging.getLogger('hungryy.expiry')
+
+
+def has_successful_payment(order_id, razorpay_order_id=None):
+    """True if a successful payment is already recorded for the order or Razorpay order."""
+    match = Payment.order_id == order_id
+    if razorpay_order_id:
+        match = or_(match, Payment.razorpay_order_id == razorpay_order_id)
+    return db.session.query(Payment.query.filter(Payment.status == 'Success', match).exists()).scalar()
+
+
+def _check_razorpay(razorpay_order_id, client):
+    """Asks Razorpay whether the order was paid.
+
+    Returns (paid, captured payment id or None).
+    """
+    razorpay_order = client.order.fetch(razorpay_order_id)
+    if razorpay_order.get('status') != 'paid':
+        return False, None
+    captured = [p for p in client.order.payments(razorpay_order_id).get('items', [])
+                if p.get('status') == 'captured']
+    return True, captured[0]['id'] if captured else None
+
+
+def _confirm(order, razorpay_payment_id):
+    order.status = 'Confirmed'
+    if not has_successful_payment(order.id, order.razorpay_order_id):
+        db.session.add(Payment(
+            outlet_id=order.outlet_id, order_id=order.id, payment_method='Razorpay',
+            razorpay_payment_id=razorpay_payment_id,
+            razorpay_order_id=order.razorpay_order_id,
+            amount=order.total_price, status='Success'
+        ))
+
+
+def expire_abandoned_orders(timeout_minutes=None, batch_size=None, client=None, max_batches=None):
+    """Expires orders whose Razorpay checkout was started but never verified.
+
+    Orders are processed oldest first in batches of batch_size. When a
+    Razorpay client is given, each candidate is first checked against the
+    Razorpay API, without holding any locks; paid orders are confirmed instead
+    and orders that cannot be checked are left pending for the next run.
+    Each batch then locks only the rows that are still pending, skipping rows
+    locked elsewhere (e.g. by verify_payment), updates them and commits.
+    Returns counts of expired, confirmed and failed orders.
+    """
+    timeout_minutes = ORDER_EXPIRY_MINUTES if timeout_minutes is None else timeout_minutes
+    batch_size = batch_size or ORDER_EXPIRY_BATCH
+    cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+    result = {'expired': 0, 'confirmed': 0, 'errors': 0}
+    skipped = set()
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        query = db.session.query(Order.id, Order.razorpay_order_id).filter(
+            Order.status == PENDING_STATUS,
+            Order.razorpay_order_id.isnot(None),
+            Order.order_date < cutoff
+        )
+        if skipped:
+            query = query.filter(Order.id.notin_(skipped))
+        candidates = query.order_by(Order.order_date).limit(batch_size).all()
+        db.session.commit()  # end the read transaction before any network calls
+        if not candidates:
+            break
+
+        paid = {}
+        for order_id, razorpay_order_id in candidates:
+            if client is None:
+                continue
+            try:
+                is_paid, razorpay_payment_id = _check_razorpay(razorpay_order_id, client)
+            except Exception as e:
+                logger.warning('Could not reconcile order %s with Razorpay: %s', order_id, e)
+                skipped.add(order_id)
+                result['errors'] += 1
+                continue
+            if is_paid:
+                paid[order_id] = razorpay_payment_id
+
+        ids = [order_id for order_id, _ in candidates if order_id not in skipped]
+        orders = Order.query.filter(
+            Order.id.in_(ids), Order.status == PENDING_STATUS
+        ).with_for_update(skip_locked=True).all() if ids else []
+        # Rows locked by someone else or no longer pending are left for the next run.
+        skipped.update(set(ids) - {order.id for order in orders})
+
+        for order in orders:
+            if order.id in paid:
+                _confirm(order, paid[order.id])
+                result['confirmed'] += 1
+                continue
+            order.status = EXPIRED_STATUS
+            if order.payment is not None and order.payment.status == 'Pending':
+                order.payment.status = EXPIRED_STATUS
+            result['expired'] += 1
+        db.session.commit()
+        batches += 1
+        if len(candidates) < batch_size:
+            break
+    return result
+
+
+@contextmanager
+def _exclusive_run():
+    """Yields whether this process holds the expiry lock.
+
+    Every gunicorn worker runs the scheduler, and cron may run the command at
+    the same time, so on PostgreSQL an advisory lock lets only one run
+    proceed; the others skip instead of repeating the same Razorpay calls.
+    Other databases are assumed to be single-process development setups.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield True
+        return
+    # A dedicated connection, since the run commits on db.session between batches.
+    with db.engine.connect() as conn:
+        acquired = conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': ORDER_EXPIRY_LOCK_KEY}).scalar()
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ORDER_EXPIRY_LOCK_KEY})
+                conn.commit()
+
+
+def run_expiry(timeout_minutes=None, batch_size=None, client=None):
+    """Runs expire_abandoned_orders unless another run holds the lock; returns None if skipped."""
+    with _exclusive_run() as acquired:
+        if not acquired:
+            return None
+        return expire_abandoned_orders(timeout_minutes, batch_size, client)
+
+
+def _run_scheduler(app, client, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                result = run_expiry(client=client)
+                if result and any(result.values()):
+                    logger.info('Order expiry: %s', result)
+            except Exception:
+                db.session.rollback()
+                logger.exception('Order expiry run failed')
+
+
+def init_expiry(app, razorpay_client):
+    """Registers `flask expire-orders`; the scheduler is started separately by the server."""
+    app.extensions['order_expiry'] = razorpay_client
+
+    @app.cli.command('expire-orders')
+    @click.option('--timeout', type=int, default=None, help='Minutes before an unpaid order expires.')
+    @click.option('--batch-size', type=int, default=None, help='Orders updated per transaction.')
+    @click.option('--reconcile/--no-reconcile', default=ORDER_EXPIRY_RECONCILE,
+                  help='Check each order against Razorpay before expiring it.')
+    def expire_orders_command(timeout, batch_size, reconcile):
+        """Expires abandoned unpaid orders."""
+        result = run_expiry(timeout, batch_size, razorpay_client if reconcile else None)
+        if result is None:
+            click.echo('Another expiry run is in progress; skipped.')
+            return
+        click.echo(f"Expired {result['expired']}, confirmed {result['confirmed']}, errors {result['errors']}")
+
+
+def start_scheduler(app):
+    """Starts the in-process expiry thread if ORDER_EXPIRY_INTERVAL is set.
+
+    Called from gunicorn's post_worker_init, so that importing the app for
+    `flask db upgrade` or `flask expire-orders` does not start it.
+    """
+    if ORDER_EXPIRY_INTERVAL <= 0 or 'order_expiry' not in getattr(app, 'extensions', {}):
+        return
+    client = app.extensions['order_expiry'] if ORDER_EXPIRY_RECONCILE else None
+    threading.Thread(
+        target=_run_scheduler, args=(app, client, ORDER_EXPIRY_INTERVAL), daemon=True, name='order-expiry'
+    ).start()
@@ -0,0 +1,34 @@
+# Gunicorn settings, selected by SERVING_MODE:
+#   sync    - one request per worker process (the original setup)
+#   gthread - THREADS requests per worker process
+#   gevent  - WORKER_CONNECTIONS cooperative requests per worker process,
+#             for slow database or Razorpay calls and long-lived clients
+import os
+
+serving_mode = os.getenv('SERVING_MODE', 'sync')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+timeout = int(os.getenv('WORKER_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+if serving_mode == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', 500))
+
+    def post_fork(server, worker):
+        # psycopg2 blocks the whole process unless it yields to gevent while
+        # waiting on the server.
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+elif serving_mode == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.getenv('THREADS', 8))
+elif serving_mode != 'sync':
+    raise RuntimeError(f'Unknown SERVING_MODE: {serving_mode}')
+
+
+def post_worker_init(worker):
+    # Only server workers run the order expiry scheduler, never `flask` CLI commands.
+    from expiry import start_scheduler
+    start_scheduler(worker.wsgi)
@@ -0,0 +1,79 @@
+"""add outlets
+
+Revision ID: 3b9c41d7a2e5
+Revises: fe8f2d1f67bc
+Create Date: 2026-10-19 10:12:40.518372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c41d7a2e5'
+down_revision = 'fe8f2d1f67bc'
+branch_labels = None
+depends_on = None
+
+SCOPED_TABLES = ('menu_items', 'orders', 'bookings', 'payments')
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Importing the app runs db.create_all(), which may already have created
+    # (and seeded) the outlets table before this migration runs.
+    if not sa.inspect(bind).has_table('outlets'):
+        op.create_table('outlets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+        )
+    # Existing rows all belong to the outlet the stack was deployed for.
+    if bind.execute(sa.text('SELECT 1 FROM outlets WHERE id = 1')).first() is None:
+        outlets = sa.table('outlets', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                           sa.column('slug', sa.String), sa.column('is_active', sa.Boolean))
+        op.bulk_insert(outlets, [{'id': 1, 'name': 'Default Outlet', 'slug': 'default', 'is_active': True}])
+    if bind.dialect.name == 'postgresql':
+        # The explicit id does not advance the sequence; later outlets would collide with it.
+        op.execute("SELECT setval(pg_get_serial_sequence('outlets', 'id'), (SELECT MAX(id) FROM outlets))")
+
+    for table in SCOPED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('outlet_id', sa.Integer(), nullable=False, server_default='1'))
+            batch_op.create_foreign_key(f'fk_{table}_outlet_id_outlets', 'outlets', ['outlet_id'], ['id'])
+        # The default only backfills existing rows; new rows must name their outlet.
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('outlet_id', existing_type=sa.Integer(), existing_nullable=False, server_default=None)
+
+    # PostgreSQL names the original unique constraint menu_items_name_key; SQLite
+    # leaves it unnamed, so batch mode gives it a name it can drop.
+    name_unique = next(uq['name'] for uq in sa.inspect(bind).get_unique_constraints('menu_items')
+                       if uq['column_names'] == ['name'])
+    with op.batch_alter_table('menu_items', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(name_unique or 'uq_menu_items_name', type_='unique')
+        batch_op.create_unique_constraint('uq_menu_items_outlet_name', ['outlet_id', 'name'])
+        batch_op.create_index('ix_menu_items_outlet_available_category', ['outlet_id', 'is_available', 'category'])
+    op.create_index('ix_orders_outlet_order_date', 'orders', ['outlet_id', 'order_date'])
+    op.create_index('ix_bookings_outlet_booking_date', 'bookings', ['outlet_id', 'booking_date', 'booking_time'])
+    op.create_index('ix_payments_outlet_payment_date', 'payments', ['outlet_id', 'payment_date'])
+
+
+def downgrade():
+    op.drop_index('ix_payments_outlet_payment_date', table_name='payments')
+    op.drop_index('ix_bookings_outlet_booking_date', table_name='bookings')
+    op.drop_index('ix_orders_outlet_order_date', table_name='orders')
+    with op.batch_alter_table('menu_items') as batch_op:
+        batch_op.drop_index('ix_menu_items_outlet_available_category')
+        batch_op.drop_constraint('uq_menu_items_outlet_name', type_='unique')
+        batch_op.create_unique_constraint('menu_items_name_key', ['name'])
+
+    for table in reversed(SCOPED_TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_outlet_id_outlets', type_='foreignkey')
+            batch_op.drop_column('outlet_id')
+
+    op.drop_table('outlets')
@@ -0,0 +1,38 @@
+"""add order expiry
+
+Revision ID: 8d2e6f0a4c19
+Revises: 3b9c41d7a2e5
+Create Date: 2026-10-19 14:02:11.904127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e6f0a4c19'
+down_revision = '3b9c41d7a2e5'
+branch_labels = None
+depends_on = None
+
+ACTIVE_PREDICATE = sa.text("status != 'Expired'")
+PENDING_PAYMENT_PREDICATE = sa.text("status = 'Pending Confirmation' AND razorpay_order_id IS NOT NULL")
+
+
+def upgrade():
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.add_column(sa.Column('razorpay_order_id', sa.String(length=100), nullable=True))
+    # Listings and reports now skip expired orders, so the partial index replaces the full one.
+    op.drop_index('ix_orders_outlet_order_date', table_name='orders')
+    op.create_index('ix_orders_outlet_active_order_date', 'orders', ['outlet_id', 'order_date'],
+                    postgresql_where=ACTIVE_PREDICATE, sqlite_where=ACTIVE_PREDICATE)
+    op.create_index('ix_orders_pending_payment_order_date', 'orders', ['order_date'],
+                    postgresql_where=PENDING_PAYMENT_PREDICATE, sqlite_where=PENDING_PAYMENT_PREDICATE)
+
+
+def downgrade():
+    op.drop_index('ix_orders_pending_payment_order_date', table_name='orders')
+    op.drop_index('ix_orders_outlet_active_order_date', table_name='orders')
+    op.create_index('ix_orders_outlet_order_date', 'orders', ['outlet_id', 'order_date'])
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('razorpay_order_id')
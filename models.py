@@ -3,10 +3,32 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+DEFAULT_OUTLET_ID = 1
+
+class Outlet(db.Model):
+    __tablename__ = 'outlets'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(50), nullable=False, unique=True)
+    is_active = db.Column(db.Boolean, default=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'is_active': self.is_active
+        }
+
 class MenuItem(db.Model):
     __tablename__ = 'menu_items'
+    __table_args__ = (
+        db.UniqueConstraint('outlet_id', 'name', name='uq_menu_items_outlet_name'),
+        db.Index('ix_menu_items_outlet_available_category', 'outlet_id', 'is_available', 'category'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False, unique=True)
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlets.id'), nullable=False, default=DEFAULT_OUTLET_ID)
+    name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(255))
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(255))
@@ -17,6 +39,7 @@ class MenuItem(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'outlet_id': self.outlet_id,
             'name': self.name,
             'description': self.description,
             'price': self.price,
@@ -28,13 +51,28 @@ class MenuItem(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Admin listings and reports skip expired orders; this index only covers the rest.
+        db.Index(
+            'ix_orders_outlet_active_order_date', 'outlet_id', 'order_date',
+            postgresql_where=db.text("status != 'Expired'"), sqlite_where=db.text("status != 'Expired'")
+        ),
+        # Scanned by the expiry job for checkouts that never completed payment.
+        db.Index(
+            'ix_orders_pending_payment_order_date', 'order_date',
+            postgresql_where=db.text("status = 'Pending Confirmation' AND razorpay_order_id IS NOT NULL"),
+            sqlite_where=db.text("status = 'Pending Confirmation' AND razorpay_order_id IS NOT NULL")
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlets.id'), nullable=False, default=DEFAULT_OUTLET_ID)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20), nullable=False)
     customer_email = db.Column(db.String(100))
     delivery_address = db.Column(db.Text)
     total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), default='Pending Confirmation')
+    status = db.Column(db.String(50), default='Pending Confirmation') # 'Pending Confirmation', 'Confirmed', ..., 'Expired'
+    razorpay_order_id = db.Column(db.String(100))
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
     order_items = db.relationship('OrderItem', backref='order', lazy=True)
     payment = db.relationship('Payment', uselist=False, backref='order')
@@ -42,12 +80,14 @@ class Order(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'outlet_id': self.outlet_id,
             'customer_name': self.customer_name,
             'customer_phone': self.customer_phone,
             'customer_email': self.customer_email,
             'delivery_address': self.delivery_address,
             'total_price': self.total_price,
             'status': self.status,
+            'razorpay_order_id': self.razorpay_order_id,
             'order_date': self.order_date.isoformat(),
             'order_items': [item.to_dict() for item in self.order_items]
         }
@@ -70,7 +110,11 @@ class OrderItem(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        db.Index('ix_bookings_outlet_booking_date', 'outlet_id', 'booking_date', 'booking_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlets.id'), nullable=False, default=DEFAULT_OUTLET_ID)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_phone = db.Column(db.String(20), nullable=False)
     booking_date = db.Column(db.Date, nullable=False)
@@ -81,6 +125,7 @@ class Booking(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'outlet_id': self.outlet_id,
             'customer_name': self.customer_name,
             'customer_phone': self.customer_phone,
             'booking_date': self.booking_date.isoformat(),
@@ -91,19 +136,24 @@ class Booking(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_outlet_payment_date', 'outlet_id', 'payment_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlets.id'), nullable=False, default=DEFAULT_OUTLET_ID)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
     payment_method = db.Column(db.String(50), nullable=False) # 'Razorpay' or 'Cash on Delivery'
     razorpay_payment_id = db.Column(db.String(100))
     razorpay_order_id = db.Column(db.String(100))
     razorpay_signature = db.Column(db.String(255))
     amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), default='Pending') # 'Pending', 'Success', 'Failed'
+    status = db.Column(db.String(50), default='Pending') # 'Pending', 'Success', 'Failed', 'Expired'
     payment_date = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
         return {
             'id': self.id,
+            'outlet_id': self.outlet_id,
             'order_id': self.order_id,
             'payment_method': self.payment_method,
             'razorpay_payment_id': self.razorpay_payment_id,
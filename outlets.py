@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+from flask import g, jsonify, request
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Outlet, DEFAULT_OUTLET_ID
+
+OUTLET_HEADER = 'X-Outlet-ID'
+# Outlets change rarely, so each worker keeps a small id/slug lookup instead
+# of querying the outlets table on every request. Entries expire after this
+# many seconds, so a deactivated outlet stops being served within that time.
+OUTLET_CACHE_TTL = float(os.getenv('OUTLET_CACHE_TTL', '60'))
+
+# Largest value an INTEGER primary key can hold.
+MAX_OUTLET_ID = 2 ** 31 - 1
+
+_lock = threading.Lock()
+_outlet_ids = {}  # id or slug -> (outlet_id, cached_at)
+
+
+def ensure_default_outlet():
+    """Creates the default outlet when the tables were created without migrations."""
+    if db.session.get(Outlet, DEFAULT_OUTLET_ID) is not None:
+        return
+    db.session.add(Outlet(id=DEFAULT_OUTLET_ID, name='Default Outlet', slug='default'))
+    try:
+        db.session.commit()
+    except IntegrityError:  # another worker seeded it first
+        db.session.rollback()
+        return
+    if db.engine.dialect.name == 'postgresql':
+        # The explicit id does not advance the sequence; later outlets would collide with it.
+        db.session.execute(text(
+            "SELECT setval(pg_get_serial_sequence('outlets', 'id'), (SELECT MAX(id) FROM outlets))"
+        ))
+        db.session.commit()
+
+
+def _lookup(key):
+    with _lock:
+        cached = _outlet_ids.get(key)
+    if cached is not None and time.monotonic() - cached[1] < OUTLET_CACHE_TTL:
+        return cached[0]
+    if key.isdecimal():
+        try:
+            outlet_id = int(key)
+        except ValueError:
+            return None
+        if not 0 < outlet_id <= MAX_OUTLET_ID:
+            return None
+        outlet = db.session.get(Outlet, outlet_id)
+    else:
+        outlet = Outlet.query.filter_by(slug=key).first()
+    outlet_id = outlet.id if outlet and outlet.is_active else None
+    if outlet_id is not None:
+        with _lock:
+            _outlet_ids[key] = (outlet_id, time.monotonic())
+    return outlet_id
+
+
+def resolve_outlet():
+    """Sets g.outlet_id from the X-Outlet-ID header or the outlet query parameter.
+
+    Either may carry the outlet id or its slug. Requests naming neither are
+    served by DEFAULT_OUTLET (or outlet 1), so single-outlet clients keep working.
+    """
+    key = request.headers.get(OUTLET_HEADER) or request.args.get('outlet') or os.getenv('DEFAULT_OUTLET')
+    if not key:
+        g.outlet_id = DEFAULT_OUTLET_ID
+        return None
+    outlet_id = _lookup(key.strip().lower())
+    if outlet_id is None:
+        return jsonify({'error': f'Unknown outlet: {key}'}), 404
+    g.outlet_id = outlet_id
+    return None
@@ -0,0 +1,155 @@
+import cProfile
+import hmac
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+# Statements recorded per profile; later ones are only counted, so an N+1 loop
+# cannot grow a stored profile without bound.
+PROFILE_MAX_QUERIES = int(os.getenv('PROFILE_MAX_QUERIES', 500))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_KEEP = int(os.getenv('SLOW_QUERY_KEEP', 200))
+
+# Endpoints that read profiles are never profiled themselves.
+UNPROFILED_ENDPOINTS = {'get_profiles', 'get_profile', 'get_slow_queries'}
+
+logger = logging.getLogger('hungryy.slow_query')
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+# cProfile hooks the whole thread, and all greenlets of a gevent worker share
+# one thread, so only one request per worker is profiled at a time.
+_profile_slot = threading.Lock()
+profiles = deque(maxlen=PROFILE_KEEP)
+slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+
+
+def is_authorized():
+    """True when the request carries the admin profiling token."""
+    token = request.headers.get(PROFILE_HEADER)
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is discarded even when the statement fails.
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - context._query_start) * 1000
+    query = {'statement': statement, 'duration_ms': round(duration_ms, 3), 'rows': cursor.rowcount}
+    if has_request_context() and 'profile' in g:
+        profile = g.profile
+        profile['query_count'] += 1
+        profile['query_ms'] += duration_ms
+        if len(profile['queries']) < PROFILE_MAX_QUERIES:
+            profile['queries'].append(query)
+        else:
+            profile['queries_dropped'] += 1
+    if duration_ms >= SLOW_QUERY_MS:
+        if has_request_context():
+            query = dict(query, path=request.path)
+        query['logged_at'] = datetime.utcnow().isoformat()
+        with _lock:
+            slow_queries.append(query)
+        logger.warning('Slow query (%.1f ms, %s rows): %s', duration_ms, cursor.rowcount, statement)
+
+
+def start_profile():
+    """before_request hook profiling requests that opt in or are sampled."""
+    if request.endpoint in UNPROFILED_ENDPOINTS:
+        return
+    if not (is_authorized() or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)):
+        return
+    if not _profile_slot.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Python 3.12+ refuses when e.g. a debugger's profiler is active
+        _profile_slot.release()
+        return
+    g.profiler = profiler
+    g.profile = {
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'started_at': datetime.utcnow().isoformat(),
+        'queries': [],
+        'query_count': 0,
+        'query_ms': 0.0,
+        'queries_dropped': 0,
+        '_start': time.perf_counter()
+    }
+
+
+def finish_profile(response):
+    """after_request hook storing the profile of the request, if one was taken."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    _profile_slot.release()
+    profile = g.pop('profile')
+    profile['duration_ms'] = round((time.perf_counter() - profile.pop('_start')) * 1000, 3)
+    profile['status'] = response.status_code
+    profile['query_ms'] = round(profile['query_ms'], 3)
+    stats_text = io.StringIO()
+    pstats.Stats(profiler, stream=stats_text).sort_stats('cumulative').print_stats(40)
+    profile['profile'] = stats_text.getvalue()
+    with _lock:
+        profile['id'] = next(_ids)
+        profiles.append(profile)
+    if PROFILE_DIR:
+        _dump(profile, profiler)
+    response.headers['X-Profile-ID'] = str(profile['id'])
+    return response
+
+
+def _discard_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_slot.release()
+
+
+def _dump(profile, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{os.getpid()}-{profile['id']:06d}-{profile['method']}-{request.endpoint or 'unknown'}"
+    base = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(base + '.prof')
+    with open(base + '.json', 'w') as f:
+        json.dump(profile, f, indent=2)
+
+
+def summarize(profile):
+    return {k: v for k, v in profile.items() if k not in ('queries', 'profile')}
+
+
+def get_profile(profile_id):
+    with _lock:
+        return next((p for p in profiles if p['id'] == profile_id), None)
+
+
+def init_profiling(app):
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(_discard_profile)
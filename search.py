@@ -0,0 +1,257 @@
+import itertools
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from models import db, MenuItem, DEFAULT_OUTLET_ID
+
+# How long a worker trusts its index before re-reading the menu. Edits made in
+# this process invalidate the index immediately; the TTL bounds how stale the
+# index can get when another gunicorn worker edited the menu.
+MENU_INDEX_TTL = float(os.getenv('MENU_INDEX_TTL', '60'))
+TRIGRAM_THRESHOLD = float(os.getenv('MENU_TRIGRAM_THRESHOLD', '0.3'))
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Match weights: an exact token beats a prefix, which beats a typo.
+_EXACT, _PREFIX, _FUZZY = 3, 2, 1
+_NAME_BOOST = 2
+
+_generations = itertools.count(1)
+
+
+def tokenize(text):
+    """Lowercases text and splits it into alphanumeric tokens."""
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _deletes(token, depth=1):
+    """Returns the token together with every variant missing up to depth characters."""
+    variants = {token}
+    frontier = {token}
+    for _ in range(depth):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+def _max_typos(token):
+    """Short words must match exactly; longer ones tolerate more typos."""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class MenuIndex:
+    """Inverted index over the available menu items, held entirely in memory."""
+
+    def __init__(self, items):
+        self.generation = next(_generations)
+        self.items = {}
+        self.postings = defaultdict(dict)   # token -> {item_id: field weight}
+        self.prefixes = defaultdict(set)    # prefix -> tokens starting with it
+        self.neighbours = defaultdict(set)  # variant missing up to two characters -> tokens
+        for item in items:
+            self.items[item['id']] = item
+            self._add(item['id'], tokenize(item['name']), _NAME_BOOST)
+            self._add(item['id'], tokenize(item['description']) + tokenize(item['category']), 1)
+        for token in self.postings:
+            for end in range(1, len(token) + 1):
+                self.prefixes[token[:end]].add(token)
+            for variant in _deletes(token, 2):
+                self.neighbours[variant].add(token)
+
+    def by_category(self):
+        """Groups the items by category, as served by GET /api/menu."""
+        menu_by_category = {}
+        for item in self.items.values():
+            if item['category'] not in menu_by_category:
+                menu_by_category[item['category']] = []
+            menu_by_category[item['category']].append(item)
+        return menu_by_category
+
+    def _add(self, item_id, tokens, weight):
+        for token in tokens:
+            postings = self.postings[token]
+            postings[item_id] = max(postings.get(item_id, 0), weight)
+
+    def _expand(self, term):
+        """Maps a query term to the indexed tokens it matches and their weights."""
+        matches = {}
+        limit = _max_typos(term)
+        if limit:
+            candidates = set()
+            for variant in _deletes(term, limit):
+                candidates |= self.neighbours.get(variant, set())
+            for token in candidates:
+                if _edit_distance(term, token, limit) <= limit:
+                    matches[token] = _FUZZY
+        for token in self.prefixes.get(term, ()):
+            matches[token] = _PREFIX
+        if term in self.postings:
+            matches[term] = _EXACT
+        return matches
+
+    def search(self, query='', veg_only=False, category=None, min_price=None, max_price=None, limit=None):
+        """Returns matching item dicts, best match first.
+
+        Every query term has to match (by exact token, prefix or typo) for an
+        item to be returned. Without a query, all items passing the filters are
+        returned ordered by category and name.
+        """
+        terms = tokenize(query)
+        if terms:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, match_weight in self._expand(term).items():
+                    for item_id, field_weight in self.postings[token].items():
+                        score = match_weight * field_weight
+                        if score > term_scores.get(item_id, 0):
+                            term_scores[item_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {i: s + term_scores[i] for i, s in scores.items() if i in term_scores}
+                if not scores:
+                    return []
+        else:
+            scores = dict.fromkeys(self.items, 0)
+
+        category = category.lower() if category else None
+        results = []
+        for item_id, score in scores.items():
+            item = self.items[item_id]
+            if veg_only and not item['is_veg']:
+                continue
+            if category and item['category'].lower() != category:
+                continue
+            if min_price is not None and item['price'] < min_price:
+                continue
+            if max_price is not None and item['price'] > max_price:
+                continue
+            results.append((score, item))
+
+        if terms:
+            results.sort(key=lambda r: (-r[0], r[1]['name']))
+        else:
+            results.sort(key=lambda r: (r[1]['category'], r[1]['name']))
+        return [item for _, item in results[:limit]]
+
+
+_lock = threading.Lock()
+_menu_versions = defaultdict(int)  # outlet_id -> version, bumped on menu commits
+_indexes = {}                      # outlet_id -> (index, version, built_at)
+
+
+def _changed_outlets(session):
+    return {
+        obj.outlet_id or DEFAULT_OUTLET_ID
+        for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, MenuItem)
+    }
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_menu_changes(session, flush_context, instances):
+    outlets = _changed_outlets(session)
+    if outlets:
+        session.info.setdefault('menu_changed', set()).update(outlets)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_menu_version(session):
+    outlets = session.info.pop('menu_changed', None)
+    if outlets:
+        with _lock:
+            for outlet_id in outlets:
+                _menu_versions[outlet_id] += 1
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_menu_changes(session):
+    session.info.pop('menu_changed', None)
+
+
+def _is_fresh(entry, outlet_id, now):
+    return entry is not None and entry[1] == _menu_versions[outlet_id] and now - entry[2] < MENU_INDEX_TTL
+
+
+def get_menu_index(outlet_id):
+    """Returns the outlet's index, rebuilding it if its menu changed or the TTL ran out."""
+    now = time.monotonic()
+    entry = _indexes.get(outlet_id)
+    if _is_fresh(entry, outlet_id, now):
+        return entry[0]
+    with _lock:
+        entry = _indexes.get(outlet_id)
+        if not _is_fresh(entry, outlet_id, now):
+            version = _menu_versions[outlet_id]
+            items = [item.to_dict() for item in MenuItem.query.filter_by(outlet_id=outlet_id, is_available=True)]
+            if entry is not None and items == list(entry[0].items.values()):
+                # Same menu: keep the index and its generation so responses cached for it stay valid.
+                index = entry[0]
+            else:
+                index = MenuIndex(items)
+            entry = (index, version, time.monotonic())
+            _indexes[outlet_id] = entry
+        return entry[0]
+
+
+_trigram_available = None
+
+
+def _has_trigram():
+    """Checks once per process whether the pg_trgm extension is installed."""
+    global _trigram_available
+    if _trigram_available is None:
+        _trigram_available = db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _trigram_available
+
+
+def trigram_search(outlet_id, query, veg_only=False, category=None, min_price=None, max_price=None, limit=None):
+    """Falls back to PostgreSQL pg_trgm similarity for queries the index cannot match.
+
+    Returns None when the database is not PostgreSQL or the pg_trgm extension
+    is not installed.
+    """
+    if db.engine.dialect.name != 'postgresql' or not query.strip() or not _has_trigram():
+        return None
+    similarity = func.greatest(
+        func.similarity(MenuItem.name, query),
+        func.word_similarity(query, func.coalesce(MenuItem.description, ''))
+    )
+    items = MenuItem.query.filter(
+        MenuItem.outlet_id == outlet_id, MenuItem.is_available.is_(True), similarity >= TRIGRAM_THRESHOLD
+    )
+    if veg_only:
+        items = items.filter(MenuItem.is_veg.is_(True))
+    if category:
+        items = items.filter(func.lower(MenuItem.category) == category.lower())
+    if min_price is not None:
+        items = items.filter(MenuItem.price >= min_price)
+    if max_price is not None:
+        items = items.filter(MenuItem.price <= max_price)
+    items = items.order_by(similarity.desc(), MenuItem.name).limit(limit).all()
+    return [item.to_dict() for item in items]
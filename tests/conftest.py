@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+
+from app import app as flask_app  # noqa: E402
+from models import db  # noqa: E402
+from outlets import ensure_default_outlet  # noqa: E402
+import search  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """Yields the app inside an app context with freshly created tables."""
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        ensure_default_outlet()
+        search._indexes.clear()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
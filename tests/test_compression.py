@@ -0,0 +1,162 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+import compression
+from compression import COMPRESS_MIN_SIZE, init_compression, negotiate_encoding
+from models import db, MenuItem
+
+LARGE = {'items': ['x' * 50] * (COMPRESS_MIN_SIZE // 10)}
+SMALL = {'ok': True}
+
+needs_brotli = pytest.mark.skipif(compression.brotli is None, reason='brotli is not installed')
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    pytest.param('br', 'br', marks=needs_brotli),
+    pytest.param('gzip, br', 'br', marks=needs_brotli),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0.1', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+    pytest.param('*', 'br', marks=needs_brotli),
+    ('*;q=0.5, gzip', 'gzip'),
+    ('GZIP;q=bad', None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_encoding_without_brotli(gzip_only):
+    assert negotiate_encoding('br') is None
+    assert negotiate_encoding('br, gzip;q=0.1') == 'gzip'
+
+
+@pytest.fixture
+def hooked_client():
+    """A bare app with the compression hook and a few canned responses."""
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route('/large')
+    def large():
+        return jsonify(LARGE)
+
+    @app.route('/small')
+    def small():
+        return jsonify(SMALL)
+
+    @app.route('/missing')
+    def missing():
+        return jsonify(LARGE), 404
+
+    @app.route('/encoded')
+    def encoded():
+        response = app.response_class(gzip.compress(json.dumps(LARGE).encode()), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    return app.test_client()
+
+
+def test_large_response_is_compressed(hooked_client, gzip_only):
+    response = hooked_client.get('/large', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data)) == LARGE
+
+
+def test_response_below_min_size_is_not_compressed(hooked_client):
+    response = hooked_client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.get_json() == SMALL
+
+
+def test_vary_is_set_when_client_accepts_no_encoding(hooked_client):
+    response = hooked_client.get('/large')
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_non_200_response_is_not_compressed(hooked_client):
+    response = hooked_client.get('/missing', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.status_code == 404
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == LARGE
+
+
+def test_already_encoded_response_is_left_alone(hooked_client):
+    response = hooked_client.get('/encoded', headers={'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == LARGE
+
+
+@pytest.fixture
+def large_menu(app):
+    compression.response_cache.clear()
+    db.session.add_all([
+        MenuItem(name=f'Dish {i}', description='Slow cooked with spices', price=100.0 + i, category='Mains')
+        for i in range(20)
+    ])
+    db.session.commit()
+    yield
+    compression.response_cache.clear()
+
+
+@pytest.fixture
+def compress_calls(monkeypatch):
+    calls = []
+    real_compress = compression._compress
+
+    def counting_compress(data, encoding, mode):
+        calls.append((encoding, mode))
+        return real_compress(data, encoding, mode)
+
+    monkeypatch.setattr(compression, '_compress', counting_compress)
+    return calls
+
+
+def test_cached_menu_is_compressed_once(client, large_menu, compress_calls):
+    first = client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/api/menu')
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in first.headers['Vary']
+    assert second.data == first.data
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert json.loads(gzip.decompress(first.data)) == plain.get_json()
+    assert compress_calls == [('gzip', 'cached')]
+
+
+@needs_brotli
+def test_cached_menu_is_compressed_once_per_encoding(client, large_menu, compress_calls):
+    client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})
+    first = client.get('/api/menu', headers={'Accept-Encoding': 'br'})
+    second = client.get('/api/menu', headers={'Accept-Encoding': 'br;q=1, gzip;q=0.5'})
+    assert first.headers['Content-Encoding'] == 'br'
+    assert second.data == first.data
+    assert compress_calls == [('gzip', 'cached'), ('br', 'cached')]
+
+
+def test_menu_change_is_compressed_again(client, large_menu, compress_calls):
+    client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})
+    db.session.add(MenuItem(name='Paneer Tikka', price=220.0, category='Mains'))
+    db.session.commit()
+
+    response = client.get('/api/menu', headers={'Accept-Encoding': 'gzip'})
+
+    names = [item['name'] for item in json.loads(gzip.decompress(response.data))['Mains']]
+    assert 'Paneer Tikka' in names
+    assert compress_calls == [('gzip', 'cached'), ('gzip', 'cached')]
@@ -0,0 +1,182 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+import expiry
+from expiry import expire_abandoned_orders
+from models import db, Order, Payment
+
+
+class StubOrders:
+    """Stands in for razorpay_client.order with canned statuses per Razorpay order id."""
+
+    def __init__(self, statuses, failing=()):
+        self.statuses = statuses
+        self.failing = set(failing)
+        self.fetched = []
+
+    def fetch(self, razorpay_order_id):
+        self.fetched.append(razorpay_order_id)
+        if razorpay_order_id in self.failing:
+            raise RuntimeError('Razorpay unavailable')
+        return {'id': razorpay_order_id, 'status': self.statuses.get(razorpay_order_id, 'attempted')}
+
+    def payments(self, razorpay_order_id):
+        return {'items': [{'id': f'pay_{razorpay_order_id}', 'status': 'captured'}]}
+
+
+class StubClient:
+    def __init__(self, statuses=None, failing=()):
+        self.order = StubOrders(statuses or {}, failing)
+
+
+def add_order(name, razorpay_order_id=None, age_minutes=120, status='Pending Confirmation'):
+    order = Order(
+        customer_name=name, customer_phone='9999999999', total_price=100.0, status=status,
+        razorpay_order_id=razorpay_order_id, order_date=datetime.utcnow() - timedelta(minutes=age_minutes)
+    )
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def status_of(name):
+    return Order.query.filter_by(customer_name=name).one().status
+
+
+def test_expires_only_old_linked_pending_orders(app):
+    add_order('abandoned', 'rp_1')
+    add_order('recent', 'rp_2', age_minutes=5)
+    add_order('cash', None)
+    add_order('confirmed', 'rp_3', status='Confirmed')
+
+    assert expire_abandoned_orders(timeout_minutes=30) == {'expired': 1, 'confirmed': 0, 'errors': 0}
+    assert status_of('abandoned') == 'Expired'
+    assert status_of('recent') == 'Pending Confirmation'
+    assert status_of('cash') == 'Pending Confirmation'
+    assert status_of('confirmed') == 'Confirmed'
+
+
+def test_processes_all_batches(app):
+    for i in range(7):
+        add_order(f'order-{i}', f'rp_{i}')
+    assert expire_abandoned_orders(timeout_minutes=30, batch_size=3)['expired'] == 7
+    assert Order.query.filter_by(status='Expired').count() == 7
+
+
+def test_max_batches_bounds_a_run(app):
+    for i in range(7):
+        add_order(f'order-{i}', f'rp_{i}')
+    assert expire_abandoned_orders(timeout_minutes=30, batch_size=3, max_batches=2)['expired'] == 6
+
+
+def test_reconcile_confirms_paid_and_skips_unreachable_orders(app):
+    add_order('paid', 'rp_paid')
+    add_order('unpaid', 'rp_unpaid')
+    add_order('unreachable', 'rp_down')
+    client = StubClient({'rp_paid': 'paid'}, failing={'rp_down'})
+
+    result = expire_abandoned_orders(timeout_minutes=30, batch_size=2, client=client)
+
+    assert result == {'expired': 1, 'confirmed': 1, 'errors': 1}
+    assert status_of('paid') == 'Confirmed'
+    assert status_of('unpaid') == 'Expired'
+    assert status_of('unreachable') == 'Pending Confirmation'
+    # The failing order is tried once per run, not once per batch.
+    assert client.order.fetched.count('rp_down') == 1
+    payment = Payment.query.one()
+    assert (payment.razorpay_order_id, payment.razorpay_payment_id) == ('rp_paid', 'pay_rp_paid')
+
+
+def test_reconcile_does_not_duplicate_a_recorded_payment(app):
+    order = add_order('paid', 'rp_paid')
+    db.session.add(Payment(order_id=order.id, payment_method='Razorpay', razorpay_order_id='rp_paid',
+                           amount=100.0, status='Success'))
+    db.session.commit()
+
+    expire_abandoned_orders(timeout_minutes=30, client=StubClient({'rp_paid': 'paid'}))
+
+    assert status_of('paid') == 'Confirmed'
+    assert Payment.query.count() == 1
+
+
+def test_command_expires_orders(app):
+    add_order('abandoned', 'rp_1')
+
+    output = app.test_cli_runner().invoke(args=['expire-orders']).output
+
+    assert 'Expired 1' in output
+    assert status_of('abandoned') == 'Expired'
+
+
+def test_command_skips_while_another_run_holds_the_lock(app, monkeypatch):
+    @contextmanager
+    def lock_held_elsewhere():
+        yield False
+
+    monkeypatch.setattr(expiry, '_exclusive_run', lock_held_elsewhere)
+    add_order('abandoned', 'rp_1')
+
+    output = app.test_cli_runner().invoke(args=['expire-orders']).output
+
+    assert 'skipped' in output
+    assert status_of('abandoned') == 'Pending Confirmation'
+
+
+@pytest.fixture
+def signature_always_valid(monkeypatch):
+    monkeypatch.setattr(app_module.razorpay_client.utility, 'verify_payment_signature', lambda params: True)
+
+
+def test_verify_after_reconcile_does_not_add_second_payment(client, signature_always_valid):
+    order = add_order('paid', 'rp_paid')
+    expire_abandoned_orders(timeout_minutes=30, client=StubClient({'rp_paid': 'paid'}))
+
+    response = client.post('/api/payments/verify', json={
+        'order_id': order.id, 'razorpay_order_id': 'rp_paid',
+        'razorpay_payment_id': 'pay_rp_paid', 'razorpay_signature': 'sig'
+    })
+
+    assert response.status_code == 200
+    assert Payment.query.filter_by(order_id=order.id).count() == 1
+
+
+def test_repeated_verify_records_one_payment(client, signature_always_valid):
+    order = add_order('paid', 'rp_paid', age_minutes=1)
+    payload = {'order_id': order.id, 'razorpay_order_id': 'rp_paid',
+               'razorpay_payment_id': 'pay_1', 'razorpay_signature': 'sig'}
+
+    assert client.post('/api/payments/verify', json=payload).status_code == 200
+    assert client.post('/api/payments/verify', json=payload).status_code == 200
+    assert Payment.query.filter_by(order_id=order.id).count() == 1
+    assert status_of('paid') == 'Confirmed'
+
+
+def verify_payload(order, razorpay_order_id):
+    return {'order_id': order.id, 'razorpay_order_id': razorpay_order_id,
+            'razorpay_payment_id': f'pay_{razorpay_order_id}', 'razorpay_signature': 'sig'}
+
+
+def test_verify_rejects_payment_of_another_linked_order(client, signature_always_valid):
+    cheap = add_order('cheap', 'rp_cheap', age_minutes=1)
+    expensive = add_order('expensive', 'rp_expensive', age_minutes=1)
+    assert client.post('/api/payments/verify', json=verify_payload(cheap, 'rp_cheap')).status_code == 200
+
+    response = client.post('/api/payments/verify', json=verify_payload(expensive, 'rp_cheap'))
+
+    assert response.status_code == 400
+    assert status_of('expensive') == 'Pending Confirmation'
+    assert Payment.query.filter_by(order_id=expensive.id).count() == 0
+
+
+def test_verify_rejects_reused_payment_for_unlinked_order(client, signature_always_valid):
+    cheap = add_order('cheap', 'rp_cheap', age_minutes=1)
+    unlinked = add_order('unlinked', None, age_minutes=1)
+    assert client.post('/api/payments/verify', json=verify_payload(cheap, 'rp_cheap')).status_code == 200
+
+    response = client.post('/api/payments/verify', json=verify_payload(unlinked, 'rp_cheap'))
+
+    assert response.status_code == 400
+    assert status_of('unlinked') == 'Pending Confirmation'
@@ -0,0 +1,74 @@
+import pytest
+
+import outlets
+from models import db, MenuItem, Order, Outlet
+
+
+@pytest.fixture
+def second_outlet(app):
+    outlets._outlet_ids.clear()
+    outlet = Outlet(name='Second Outlet', slug='second')
+    db.session.add(outlet)
+    db.session.commit()
+    db.session.add_all([
+        MenuItem(outlet_id=1, name='Samosa', price=50.0, category='Appetizers'),
+        MenuItem(outlet_id=outlet.id, name='Samosa', price=60.0, category='Appetizers'),
+    ])
+    db.session.commit()
+    yield outlet
+    outlets._outlet_ids.clear()
+
+
+def menu_price(response):
+    return response.get_json()['Appetizers'][0]['price']
+
+
+def test_requests_without_outlet_use_the_default(client, second_outlet):
+    assert menu_price(client.get('/api/menu')) == 50.0
+
+
+@pytest.mark.parametrize('header, query', [
+    ({'X-Outlet-ID': '2'}, ''),
+    ({'X-Outlet-ID': 'second'}, ''),
+    ({}, '?outlet=2'),
+    ({}, '?outlet=Second'),
+])
+def test_outlet_resolved_by_header_or_query_id_or_slug(client, second_outlet, header, query):
+    assert menu_price(client.get('/api/menu' + query, headers=header)) == 60.0
+
+
+@pytest.mark.parametrize('key', ['nope', '99', '0', '%C2%B2', '99999999999999999999'])
+def test_unknown_outlet_is_404(client, second_outlet, key):
+    response = client.get(f'/api/menu?outlet={key}')
+    assert response.status_code == 404
+    assert response.get_json()['error'].startswith('Unknown outlet')
+
+
+def test_inactive_outlet_is_404_once_cache_expires(client, second_outlet, monkeypatch):
+    assert client.get('/api/menu?outlet=second').status_code == 200
+    second_outlet.is_active = False
+    db.session.commit()
+    monkeypatch.setattr(outlets, 'OUTLET_CACHE_TTL', 0)
+    assert client.get('/api/menu?outlet=second').status_code == 404
+
+
+def test_cross_outlet_menu_edits_are_rejected(client, second_outlet):
+    other_item = MenuItem.query.filter_by(outlet_id=second_outlet.id).one()
+    assert client.put(f'/api/admin/menu/{other_item.id}', json={'price': 1}).status_code == 404
+    assert client.delete(f'/api/admin/menu/{other_item.id}').status_code == 404
+    assert db.session.get(MenuItem, other_item.id).price == 60.0
+
+
+def test_orders_are_scoped_to_their_outlet(client, second_outlet):
+    response = client.post('/api/orders', headers={'X-Outlet-ID': 'second'}, json={
+        'customer_name': 'Asha', 'customer_phone': '9999999999', 'total_price': 120.0,
+        'items': [{'name': 'Samosa', 'quantity': 2}]
+    })
+    order_id = response.get_json()['order_id']
+    order = db.session.get(Order, order_id)
+    assert order.outlet_id == second_outlet.id
+    assert order.order_items[0].price == 60.0
+
+    assert client.get('/api/admin/orders').get_json() == []
+    assert [o['id'] for o in client.get('/api/admin/orders?outlet=second').get_json()] == [order_id]
+    assert client.put(f'/api/admin/orders/{order_id}/status', json={'status': 'Confirmed'}).status_code == 404
@@ -0,0 +1,102 @@
+import pytest
+
+from models import db, MenuItem
+from search import MenuIndex, get_menu_index
+
+ITEMS = [
+    {'id': 1, 'name': 'Chicken Tikka Masala', 'description': 'Grilled chicken in a creamy tomato sauce.',
+     'category': 'Main Course', 'is_veg': False, 'price': 280.0},
+    {'id': 2, 'name': 'Matar Paneer', 'description': 'Cottage cheese and green peas.',
+     'category': 'Main Course', 'is_veg': True, 'price': 190.0},
+    {'id': 3, 'name': 'Masala Chai', 'description': 'Spiced tea.',
+     'category': 'Beverages', 'is_veg': True, 'price': 40.0},
+    {'id': 4, 'name': 'Paneer Tikka', 'description': 'Grilled cottage cheese.',
+     'category': 'Appetizers', 'is_veg': True, 'price': 220.0},
+    {'id': 5, 'name': 'Vegetable Biryani', 'description': 'Rice with vegetables, served with paneer raita.',
+     'category': 'Main Course', 'is_veg': True, 'price': 180.0},
+]
+
+
+@pytest.fixture
+def index():
+    return MenuIndex(ITEMS)
+
+
+def names(results):
+    return [item['name'] for item in results]
+
+
+def test_prefix_match(index):
+    assert names(index.search('pan')) == ['Matar Paneer', 'Paneer Tikka', 'Vegetable Biryani']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('panner', 'Paneer Tikka'),
+    ('biryni', 'Vegetable Biryani'),
+    ('masalaa', 'Masala Chai'),
+    ('masalaaa', 'Masala Chai'),
+])
+def test_typo_match(index, query, expected):
+    assert expected in names(index.search(query))
+
+
+def test_short_terms_need_exact_or_prefix_match(index):
+    assert index.search('tez') == []
+
+
+def test_all_terms_must_match(index):
+    assert names(index.search('chiken tika')) == ['Chicken Tikka Masala']
+    assert index.search('chicken chai') == []
+
+
+def test_exact_name_match_ranks_above_description_and_typo(index):
+    # 'paneer' is in three names exactly and in one description.
+    assert names(index.search('paneer'))[-1] == 'Vegetable Biryani'
+    # An exact token outranks a typo match of the same word.
+    assert names(index.search('masala'))[0] in ('Chicken Tikka Masala', 'Masala Chai')
+
+
+def test_filters(index):
+    assert names(index.search('tikka', veg_only=True)) == ['Paneer Tikka']
+    assert names(index.search('', category='main course', max_price=200)) == ['Matar Paneer', 'Vegetable Biryani']
+    assert names(index.search('', min_price=200)) == ['Paneer Tikka', 'Chicken Tikka Masala']
+    assert len(index.search('', limit=2)) == 2
+
+
+def test_index_rebuilds_after_menu_commit(app):
+    db.session.add(MenuItem(name='Samosa', price=50.0, category='Appetizers'))
+    db.session.commit()
+    first = get_menu_index(1)
+    assert names(first.search('samosa')) == ['Samosa']
+
+    db.session.add(MenuItem(name='Onion Bhaji', price=70.0, category='Appetizers'))
+    db.session.commit()
+    assert names(get_menu_index(1).search('bhaji')) == ['Onion Bhaji']
+
+
+def test_search_endpoint(client):
+    db.session.add(MenuItem(name='Garlic Naan', price=45.0, category='Bread'))
+    db.session.commit()
+    response = client.get('/api/menu/search?q=garlik')
+    assert response.get_json()['results'][0]['name'] == 'Garlic Naan'
+    assert client.get('/api/menu/search?limit=0').status_code == 400
+    assert client.get('/api/menu/search?min_price=10&max_price=50').get_json()['count'] == 1
+
+
+@pytest.mark.parametrize('args', ['min_price=cheap', 'max_price=', 'max_price=nan', 'min_price=inf'])
+def test_search_endpoint_rejects_invalid_price(client, args):
+    response = client.get(f'/api/menu/search?{args}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f"Invalid {args.split('=')[0]}"
+
+
+def test_ttl_rebuild_keeps_generation_when_menu_is_unchanged(app, monkeypatch):
+    db.session.add(MenuItem(name='Samosa', price=50.0, category='Appetizers'))
+    db.session.commit()
+    first = get_menu_index(1)
+    monkeypatch.setattr('search.MENU_INDEX_TTL', 0)
+    assert get_menu_index(1).generation == first.generation
+
+    MenuItem.query.filter_by(name='Samosa').update({'price': 55.0})
+    db.session.commit()
+    assert get_menu_index(1).generation != first.generation